@@ -1,10 +1,17 @@
-from flask import Flask, g, jsonify, request, render_template, send_from_directory
+from flask import Flask, Response, g, jsonify, request, render_template, send_from_directory
+import hashlib
 import sqlite3
 import os
 from datetime import datetime
 from flask_cors import CORS
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "shelters.db")
+DB_MMAP_SIZE = 268435456  # 256 MiB
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 CORS(app)
@@ -15,6 +22,12 @@ def get_db():
     if db is None:
         db = g._database = sqlite3.connect(DB_PATH, check_same_thread=False)
         db.row_factory = sqlite3.Row
+        if DB_PATH != ":memory:":
+            # WAL keeps list_shelters readers from blocking the POST writer
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        db.execute("PRAGMA temp_store=MEMORY")
     return db
 
 
@@ -56,68 +69,120 @@ def index():
 
 @app.route("/api/shelters", methods=["GET"])
 def list_shelters():
+    limit = request.args.get("limit", type=int)
     db = get_db()
-    cur = db.execute("SELECT * FROM shelters")
-    rows = cur.fetchall()
-    shelters = []
-    for r in rows:
-        shelters.append({k: r[k] for k in r.keys()})
-    return jsonify({"ok": True, "shelters": shelters})
-
-
-@app.route("/api/shelters", methods=["POST"])
-def add_shelter():
-    data = request.get_json(force=True)
+    # cheap validator: any insert or update changes the count or MAX(modified_at)
+    count, last_modified = db.execute(
+        "SELECT COUNT(*), COALESCE(MAX(modified_at), '') FROM shelters"
+    ).fetchone()
+    etag = hashlib.blake2b(f"{count}:{last_modified}:{limit}".encode(), digest_size=8).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+    else:
+        if limit is not None:
+            cur = db.execute("SELECT * FROM shelters LIMIT ?", (limit,))
+        else:
+            cur = db.execute("SELECT * FROM shelters")
+        # column names once, then stream rows straight off the cursor
+        cols = [d[0] for d in cur.description]
+        payload = {"ok": True, "shelters": [dict(zip(cols, row)) for row in cur]}
+        if orjson is not None:
+            resp = Response(orjson.dumps(payload), mimetype="application/json")
+        else:
+            resp = jsonify(payload)
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, must-revalidate"
+    return resp
+
+
+# upsert: replace on conflict
+UPSERT_SHELTER_SQL = """
+    INSERT INTO shelters (id, name, description, lat, lng, capacity, contact, created_at, modified_at, verified, source, version)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+      name=excluded.name,
+      description=excluded.description,
+      lat=excluded.lat,
+      lng=excluded.lng,
+      capacity=excluded.capacity,
+      contact=excluded.contact,
+      modified_at=excluded.modified_at,
+      verified=excluded.verified,
+      source=excluded.source,
+      version=excluded.version
+"""
+
+
+def shelter_params(data, now):
+    """Validate one shelter payload and return its UPSERT_SHELTER_SQL parameters."""
+    if not isinstance(data, dict):
+        raise ValueError("shelter must be an object")
     required = ("id", "name", "lat", "lng")
     for k in required:
         if k not in data:
-            return jsonify({"ok": False, "error": f"missing {k}"}), 400
-
-    doc_id = data["id"]
-    name = data.get("name", "")
-    description = data.get("description", "")
-    lat = float(data.get("lat"))
-    lng = float(data.get("lng"))
-    capacity = int(data.get("capacity") or 0)
-    contact = data.get("contact", "")
-    now = datetime.utcnow().isoformat() + "Z"
-    verified = int(bool(data.get("verified")))
-
-    db = get_db()
-    # upsert: replace on conflict
-    db.execute(
-        """
-        INSERT INTO shelters (id, name, description, lat, lng, capacity, contact, created_at, modified_at, verified, source, version)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(id) DO UPDATE SET
-          name=excluded.name,
-          description=excluded.description,
-          lat=excluded.lat,
-          lng=excluded.lng,
-          capacity=excluded.capacity,
-          contact=excluded.contact,
-          modified_at=excluded.modified_at,
-          verified=excluded.verified,
-          source=excluded.source,
-          version=excluded.version
-        """,
-        (
-            doc_id,
-            name,
-            description,
-            lat,
-            lng,
-            capacity,
-            contact,
+            raise ValueError(f"missing {k}")
+    try:
+        return (
+            data["id"],
+            data.get("name", ""),
+            data.get("description", ""),
+            float(data.get("lat")),
+            float(data.get("lng")),
+            int(data.get("capacity") or 0),
+            data.get("contact", ""),
             now,
             now,
-            verified,
+            int(bool(data.get("verified"))),
             data.get("source", "client"),
             int(data.get("version") or 1),
-        ),
-    )
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid value: {e}")
+
+
+def upsert_shelters(params):
+    db = get_db()
+    # one transaction (and one WAL sync) for the whole batch
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.executemany(UPSERT_SHELTER_SQL, params)
+    except Exception:
+        db.rollback()
+        raise
     db.commit()
-    return jsonify({"ok": True, "id": doc_id})
+
+
+@app.route("/api/shelters", methods=["POST"])
+def add_shelter():
+    data = request.get_json(force=True)
+    now = datetime.utcnow().isoformat() + "Z"
+    try:
+        params = shelter_params(data, now)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    upsert_shelters([params])
+    return jsonify({"ok": True, "id": params[0]})
+
+
+@app.route("/api/shelters/bulk", methods=["POST"])
+def add_shelters_bulk():
+    data = request.get_json(force=True)
+    shelters = data.get("shelters") if isinstance(data, dict) else None
+    if not isinstance(shelters, list):
+        return jsonify({"ok": False, "error": "missing shelters"}), 400
+
+    now = datetime.utcnow().isoformat() + "Z"
+    params = []
+    # validate everything before writing anything
+    for i, item in enumerate(shelters):
+        try:
+            params.append(shelter_params(item, now))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": f"shelters[{i}]: {e}"}), 400
+
+    upsert_shelters(params)
+    return jsonify({"ok": True, "ids": [p[0] for p in params]})
 
 
 # optional static route for service worker (if needed)
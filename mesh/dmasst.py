@@ -11,13 +11,22 @@ Fully debugged and ready-to-run:
 """
 import argparse
 import asyncio
+import concurrent.futures
+import hashlib
 import json
+import logging
+import logging.handlers
+import queue
+import secrets
 import socket
 import sqlite3
 import sys
-import uuid
-from contextlib import closing
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from typing import Optional
 
 try:
@@ -25,11 +34,39 @@ try:
 except ImportError:
     requests = None
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import uvloop
+except ImportError:
+    # not available on Windows; the default asyncio loop is used instead
+    uvloop = None
+
 # --- network config ---
 BCAST_PORT = 50000
 BCAST_ADDR = "255.255.255.255"
 BCAST_INTERVAL = 2.0
 RECV_BUFFER = 65536
+RECV_SOCK_BUFFER = 4 * 1024 * 1024  # kernel receive buffer to absorb bursts
+IN_QUEUE_MAX = 1024  # parsed packets waiting for the consumer
+PACKET_MAGIC = b"DM\x01"  # header: magic + 8-byte sender node hash, then JSON
+PACKET_TAG_LEN = len(PACKET_MAGIC) + 8
+ANNOUNCE_PREFIX = b'{"type":"ANNOUNCE"'  # how every announce we encode begins, see UDPPeer
+RECV_BATCH = 32  # max datagrams read per readable event before yielding
+SEND_BATCH = 100  # max queued datagrams sent per sender wakeup
+SEND_RETRY_DELAY = 0.01  # sender back-off while the kernel send buffer is full
+ONLINE_CHECK_TTL = 5.0  # seconds a connectivity probe result is reused
+FEED_MAX_BYTES = 1024 * 1024  # feeds announcing a larger Content-Length are skipped
+FEED_HASH_BYTES = 65536  # prefix of the feed body used as its dedup signature
+FEED_OFFLOAD_BYTES = 65536  # larger feed bodies are parsed in a worker process
 
 # --- message behavior ---
 MESSAGE_TTL = 6
@@ -40,12 +77,49 @@ SOS_RESEND_INTERVAL = 5.0  # seconds between SOS resends
 
 # --- database ---
 DB_FILE_TEMPLATE = "dmasst_{node_id}.db"
+DB_MMAP_SIZE = 268435456  # 256 MiB
+DB_CACHE_SIZE = -20000  # negative = KiB, so ~20 MB of page cache
+FLUSH_INTERVAL = 0.05  # seconds between batched commits
+FLUSH_MAX_PENDING = 32  # commit early once this many writes are pending
+RECENT_IDS_MAX = 4096  # message ids remembered in memory for duplicate checks
 DEFAULT_ALERT_FEEDS = []
 
+log = logging.getLogger("dmasst")
+
 # --- utility ---
+def setup_logging(verbose=False):
+    # the hot path only enqueues records; a listener thread formats and writes them
+    q = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(q, handler)
+    logging.getLogger().addHandler(logging.handlers.QueueHandler(q))
+    log.setLevel(logging.INFO if verbose else logging.WARNING)
+    listener.start()
+    return listener
+
 def now_iso():
     return datetime.now(timezone.utc).isoformat()
 
+if orjson is not None:
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def loads(data):
+        # json.loads takes bytes but not the memoryviews the receiver hands out
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+if xxhash:
+    def content_hash(data: bytes) -> str:
+        return xxhash.xxh64_hexdigest(data)
+else:
+    def content_hash(data: bytes) -> str:
+        # stable across restarts, unlike the per-process salted hash()
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+
 def parse_iso(ts: str) -> datetime:
     try:
         return datetime.fromisoformat(ts.replace("Z", "+00:00"))
@@ -54,10 +128,49 @@ def parse_iso(ts: str) -> datetime:
 
 # ------------------- STORAGE -------------------
 class Storage:
+    INSERT_MESSAGE_SQL = (
+        "INSERT OR IGNORE INTO messages(id, origin_id, origin_label, dest_id, type, payload, timestamp, received_at, hops, ttl, forwarded, acknowledged, resend_count)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    MARK_FORWARDED_SQL = "UPDATE messages SET forwarded = 1 WHERE id = ?"
+    MARK_ACKNOWLEDGED_SQL = "UPDATE messages SET acknowledged = 1 WHERE id = ?"
+    INCREMENT_RESEND_SQL = "UPDATE messages SET resend_count = resend_count + 1 WHERE id = ?"
+    SET_RESEND_COUNT_SQL = "UPDATE messages SET resend_count = ? WHERE id = ?"
+    INSERT_ALERT_SQL = "INSERT OR REPLACE INTO alerts(id, title, body, source, fetched_at) VALUES (?, ?, ?, ?, ?)"
+    DELETE_EXPIRED_SQL = "DELETE FROM messages WHERE received_at < ?"
+    LIST_MESSAGES_SQL = "SELECT * FROM messages ORDER BY rowid DESC LIMIT ?"
+    LIST_UNSEEN_MESSAGES_SQL = "SELECT * FROM messages WHERE forwarded=0 ORDER BY rowid DESC LIMIT ?"
+    LIST_ALERTS_SQL = "SELECT * FROM alerts ORDER BY fetched_at DESC LIMIT ?"
+    PENDING_MESSAGES_SQL = "SELECT * FROM messages WHERE forwarded=0 OR (type='SOS' AND acknowledged=0)"
+    GET_MESSAGE_SQL = "SELECT * FROM messages WHERE id = ?"
+    UNACKNOWLEDGED_SOS_SQL = "SELECT * FROM messages WHERE type='SOS' AND acknowledged=0 AND ttl > 0 ORDER BY rowid ASC"
+
     def __init__(self, db_path):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # autocommit mode: batched writes open their transaction explicitly in _write
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, cached_statements=256)
         self.conn.row_factory = sqlite3.Row
+        self._cur = self.conn.cursor()
+        if db_path != ":memory:":
+            # WAL lets readers run alongside the writer and needs far fewer fsyncs per commit
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute(f"PRAGMA cache_size={DB_CACHE_SIZE}")
+        self._pending_writes = 0
+        self._batch_depth = 0
+        self._recent_ids = OrderedDict()
         self._init()
+        # separate read-only connection for list/pending scans; under WAL it never blocks the writer
+        if db_path == ":memory:":
+            self._r_conn = self.conn
+        else:
+            uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+            self._r_conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None, cached_statements=256)
+            self._r_conn.row_factory = sqlite3.Row
+            self._r_conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        # reused for every read; results are fully fetched before the next statement
+        self._r_cur = self._r_conn.cursor()
 
     def _init(self):
         c = self.conn.cursor()
@@ -95,106 +208,159 @@ class Storage:
                 fetched_at TEXT
             )"""
         )
+        # partial index: only unforwarded rows, so pending scans stay small
+        c.execute("CREATE INDEX IF NOT EXISTS idx_msg_pending ON messages(forwarded) WHERE forwarded=0")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_alerts_fetched ON alerts(fetched_at DESC)")
+        # unacknowledged SOS rows for the resender and the pending scan's OR branch
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sos_unack ON messages(type, acknowledged, ttl) WHERE type='SOS' AND acknowledged=0"
+        )
+        c.execute("CREATE INDEX IF NOT EXISTS idx_msg_received_at ON messages(received_at)")
+        # gather planner statistics until there are some: ANALYZE over still-empty tables
+        # creates sqlite_stat1 without rows, so test for rows rather than for the table
+        has_stats = c.execute("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'").fetchone()
+        if not has_stats or not c.execute("SELECT 1 FROM sqlite_stat1 LIMIT 1").fetchone():
+            c.execute("ANALYZE")
         self.conn.commit()
 
-    # --- message operations ---
-    def insert_message(self, msg):
-        c = self.conn.cursor()
+    # --- write batching ---
+    def _write(self, sql, params):
+        if not self.conn.in_transaction:
+            self._cur.execute("BEGIN")
+        self._cur.execute(sql, params)
+        self._note_write()
+        return self._cur.rowcount
+
+    def _note_write(self):
+        self._pending_writes += 1
+        if self._pending_writes >= FLUSH_MAX_PENDING and not self._batch_depth:
+            self.flush()
+
+    @contextmanager
+    def transaction(self):
+        # group a pass of writes into a single COMMIT; what ran is committed even on
+        # error, since e.g. resend counts track packets that were already sent
+        self._batch_depth += 1
         try:
-            c.execute(
-                "INSERT INTO messages(id, origin_id, origin_label, dest_id, type, payload, timestamp, received_at, hops, ttl, forwarded, acknowledged, resend_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    msg["id"],
-                    msg.get("origin_id", ""),
-                    msg.get("origin_label", ""),
-                    msg.get("dest_id", ""),
-                    msg.get("type", ""),
-                    msg.get("payload", ""),
-                    msg.get("timestamp", now_iso()),
-                    now_iso(),
-                    msg.get("hops", 0),
-                    msg.get("ttl", MESSAGE_TTL),
-                    msg.get("forwarded", 0),
-                    msg.get("acknowledged", 0),
-                    msg.get("resend_count", 0),
-                ),
-            )
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
+
+    def flush(self):
+        if self._pending_writes:
             self.conn.commit()
+            self._pending_writes = 0
+
+    def optimize(self):
+        # SQLite's recommended shutdown step: cheaply re-analyzes tables whose
+        # statistics are missing or stale given this session's queries
+        self.flush()
+        try:
+            self.conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            log.warning("[db] optimize failed: %s", e)
+
+    async def flusher(self):
+        # one COMMIT per FLUSH_INTERVAL instead of one per received packet
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    # --- message operations ---
+    def _remember_id(self, message_id):
+        self._recent_ids[message_id] = None
+        if len(self._recent_ids) > RECENT_IDS_MAX:
+            self._recent_ids.popitem(last=False)
+
+    def seen(self, message_id):
+        # O(1) in-memory duplicate check; never touches SQLite
+        if message_id in self._recent_ids:
+            self._recent_ids.move_to_end(message_id)
             return True
-        except sqlite3.IntegrityError:
-            return False
+        return False
+
+    def insert_message(self, msg):
+        # callers handling relayed packets check seen() first; INSERT OR IGNORE
+        # still catches any duplicate that slips past the in-memory window
+        mid = msg["id"]
+        now = now_iso()
+        inserted = self._write(
+            self.INSERT_MESSAGE_SQL,
+            (
+                mid,
+                msg.get("origin_id", ""),
+                msg.get("origin_label", ""),
+                msg.get("dest_id", ""),
+                msg.get("type", ""),
+                msg.get("payload", ""),
+                msg.get("timestamp", now),
+                now,
+                msg.get("hops", 0),
+                msg.get("ttl", MESSAGE_TTL),
+                msg.get("forwarded", 0),
+                msg.get("acknowledged", 0),
+                msg.get("resend_count", 0),
+            ),
+        )
+        self._remember_id(mid)
+        # rowcount 0 means the id was already stored
+        return inserted == 1
 
     def mark_forwarded(self, message_id):
-        c = self.conn.cursor()
-        c.execute("UPDATE messages SET forwarded = 1 WHERE id = ?", (message_id,))
-        self.conn.commit()
+        self._write(self.MARK_FORWARDED_SQL, (message_id,))
 
     def mark_acknowledged(self, message_id):
-        c = self.conn.cursor()
-        c.execute("UPDATE messages SET acknowledged = 1 WHERE id = ?", (message_id,))
-        self.conn.commit()
+        self._write(self.MARK_ACKNOWLEDGED_SQL, (message_id,))
 
     def increment_resend(self, message_id):
-        c = self.conn.cursor()
-        c.execute("UPDATE messages SET resend_count = resend_count + 1 WHERE id = ?", (message_id,))
-        self.conn.commit()
+        self._write(self.INCREMENT_RESEND_SQL, (message_id,))
 
     def set_resend_count(self, message_id, val):
-        c = self.conn.cursor()
-        c.execute("UPDATE messages SET resend_count = ? WHERE id = ?", (val, message_id))
-        self.conn.commit()
+        self._write(self.SET_RESEND_COUNT_SQL, (val, message_id))
 
-    def list_messages(self, unseen_only=False):
-        c = self.conn.cursor()
-        if unseen_only:
-            c.execute(
-                "SELECT * FROM messages WHERE forwarded=0 ORDER BY rowid DESC"
-            )
-        else:
-            c.execute("SELECT * FROM messages ORDER BY rowid DESC")
-        return c.fetchall()
+    def list_messages(self, unseen_only=False, limit=200):
+        sql = self.LIST_UNSEEN_MESSAGES_SQL if unseen_only else self.LIST_MESSAGES_SQL
+        return self._r_cur.execute(sql, (limit,)).fetchall()
 
-    def list_alerts(self):
-        c = self.conn.cursor()
-        c.execute("SELECT * FROM alerts ORDER BY fetched_at DESC")
-        return c.fetchall()
+    def list_alerts(self, limit=50):
+        return self._r_cur.execute(self.LIST_ALERTS_SQL, (limit,)).fetchall()
 
     def insert_alert(self, alert_id, title, body, source):
-        c = self.conn.cursor()
-        c.execute(
-            "INSERT OR REPLACE INTO alerts(id, title, body, source, fetched_at) VALUES (?, ?, ?, ?, ?)",
-            (alert_id, title, body, source, now_iso()),
-        )
-        self.conn.commit()
+        self._write(self.INSERT_ALERT_SQL, (alert_id, title, body, source, now_iso()))
 
     def get_pending_messages(self):
-        c = self.conn.cursor()
-        c.execute(
-            "SELECT * FROM messages WHERE forwarded=0 OR (type='SOS' AND acknowledged=0)"
-        )
-        return c.fetchall()
+        return self._r_cur.execute(self.PENDING_MESSAGES_SQL).fetchall()
 
     def get_message(self, message_id):
-        c = self.conn.cursor()
-        c.execute("SELECT * FROM messages WHERE id = ?", (message_id,))
-        return c.fetchone()
+        # writer connection: must see rows that are not committed yet
+        return self._cur.execute(self.GET_MESSAGE_SQL, (message_id,)).fetchone()
 
     def get_unacknowledged_sos(self, age_limit_seconds=3600):
         cutoff = datetime.now(timezone.utc) - timedelta(seconds=age_limit_seconds)
-        c = self.conn.cursor()
-        c.execute(
-            "SELECT * FROM messages WHERE type='SOS' AND acknowledged=0 AND ttl > 0 ORDER BY rowid ASC"
-        )
-        return c.fetchall()
+        return self._r_cur.execute(self.UNACKNOWLEDGED_SOS_SQL).fetchall()
 
     def cleanup_expired(self):
         cutoff = datetime.now(timezone.utc) - timedelta(days=7)
-        c = self.conn.cursor()
-        c.execute("DELETE FROM messages WHERE received_at < ?", (cutoff.isoformat(),))
-        self.conn.commit()
+        self._write(self.DELETE_EXPIRED_SQL, (cutoff.isoformat(),))
+        self.flush()
 
 
 # ------------------- UDPPER -------------------
+class _PeerProtocol(asyncio.DatagramProtocol):
+    """Datagram callbacks for loops without add_reader support"""
+
+    def __init__(self, peer):
+        self.peer = peer
+
+    def datagram_received(self, data, addr):
+        self.peer._on_datagram(data, addr)
+
+    def error_received(self, exc):
+        log.warning("[udp] recv failed: %s", exc)
+
+
 class UDPPeer:
     """UDP Peer communication"""
 
@@ -209,38 +375,122 @@ class UDPPeer:
             self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         except Exception:
             pass
+        try:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_SOCK_BUFFER)
+        except Exception:
+            pass
         self._sock.bind(("", BCAST_PORT))
         self._sock.setblocking(False)
+        self._in_q = asyncio.Queue(maxsize=IN_QUEUE_MAX)
+        # one receive buffer for the life of the socket; packets are parsed before the next read
+        self._recv_buf = bytearray(RECV_BUFFER)
+        self._recv_view = memoryview(self._recv_buf)
+        self._out_q = asyncio.Queue()
+        # lets the receiver drop our own echoed broadcasts without parsing them
+        self._self_tag = PACKET_MAGIC + hashlib.blake2b(node_id.encode("utf-8"), digest_size=8).digest()
+        # only the timestamp changes between announces: pre-encode the rest once
+        announce = self._self_tag + dumps({"type": "ANNOUNCE", "node_id": node_id, "label": node_label, "timestamp": ""})
+        self._announce_tpl = announce[:-2].replace(b"%", b"%%") + b'%s"}'
+
+    def send_packet(self, data: dict, flush=False):
+        # flush=True bypasses the outbound queue for latency-sensitive sends
+        raw = self._self_tag + dumps(data)
+        if flush:
+            if not self._sendto(raw):
+                # send buffer full: let the sender retry it instead of dropping it
+                self._out_q.put_nowait(raw)
+        else:
+            self._out_q.put_nowait(raw)
 
-    def send_packet(self, data: dict):
-        raw = json.dumps(data).encode("utf-8")
+    def _sendto(self, raw: bytes) -> bool:
+        # False only when the non-blocking socket would block, i.e. worth retrying
         try:
             self._sock.sendto(raw, (BCAST_ADDR, BCAST_PORT))
+        except (BlockingIOError, InterruptedError):
+            return False
         except Exception as e:
-            print("[udp] send failed:", e)
+            log.warning("[udp] send failed: %s", e)
+        return True
+
+    async def sender(self):
+        while True:
+            batch = [await self._out_q.get()]
+            while len(batch) < SEND_BATCH:
+                try:
+                    batch.append(self._out_q.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            for raw in batch:
+                while not self._sendto(raw):
+                    await asyncio.sleep(SEND_RETRY_DELAY)
 
     async def broadcaster(self):
-        loop = asyncio.get_running_loop()
         while True:
-            announce = {"type": "ANNOUNCE", "node_id": self.node_id, "label": self.node_label, "timestamp": now_iso()}
-            await loop.run_in_executor(None, lambda: self.send_packet(announce))
+            # the socket is non-blocking, so send inline rather than via an executor
+            if not self._sendto(self._announce_tpl % now_iso().encode("ascii")):
+                log.debug("[udp] send buffer full, skipped announce")
             await asyncio.sleep(BCAST_INTERVAL)
 
-    async def receiver(self, on_message_cb):
+    async def receiver(self):
+        # only reads and parses; storage and relay happen in consumer()
         loop = asyncio.get_running_loop()
+        fd = self._sock.fileno()
+        try:
+            loop.add_reader(fd, self._drain)
+        except NotImplementedError:
+            # e.g. the Windows proactor loop: let its datagram transport call us back
+            transport, _ = await loop.create_datagram_endpoint(lambda: _PeerProtocol(self), sock=self._sock)
+            try:
+                await loop.create_future()  # runs until cancelled
+            finally:
+                transport.close()
+            return
+        try:
+            await loop.create_future()  # runs until cancelled
+        finally:
+            loop.remove_reader(fd)
+
+    def _enqueue(self, msg, addr):
+        if self._in_q.full():
+            # overloaded: drop the oldest packet rather than stall the socket
+            self._in_q.get_nowait()
+        self._in_q.put_nowait((msg, addr))
+
+    def _on_datagram(self, data, addr):
+        if data[:len(PACKET_MAGIC)] == PACKET_MAGIC:
+            if data[:PACKET_TAG_LEN] == self._self_tag:
+                return  # our own broadcast echoed back
+            data = data[PACKET_TAG_LEN:]
+        if data[:len(ANNOUNCE_PREFIX)] == ANNOUNCE_PREFIX:
+            return  # announces carry nothing the handlers use; skip the parse
+        try:
+            msg = loads(data)
+        except Exception as e:
+            log.warning("[recv] invalid packet from %s: %s", addr, e)
+            return
+        self._enqueue(msg, addr)
+
+    def _drain(self):
+        # read up to RECV_BATCH datagrams per wakeup instead of one await per packet;
+        # the reader is level-triggered, so anything left over fires it again after
+        # other tasks get a turn
+        for _ in range(RECV_BATCH):
+            try:
+                nbytes, addr = self._sock.recvfrom_into(self._recv_buf)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                log.warning("[udp] recv failed: %s", e)
+                return
+            self._on_datagram(self._recv_view[:nbytes], addr)
+
+    async def consumer(self, on_message_cb):
         while True:
+            msg, addr = await self._in_q.get()
             try:
-                data, addr = await loop.sock_recvfrom(self._sock, RECV_BUFFER)
-                try:
-                    msg = json.loads(data.decode("utf-8"))
-                except Exception as e:
-                    print(f"[recv] invalid packet from {addr}: {e}")
-                    continue
                 await on_message_cb(msg, addr)
-            except (asyncio.CancelledError, KeyboardInterrupt):
-                break
             except Exception as e:
-                await asyncio.sleep(0.01)
+                log.warning("[recv] failed to handle packet from %s: %s", addr, e)
 
     def close(self):
         try:
@@ -249,76 +499,152 @@ class UDPPeer:
             pass
 
 
-# ------------------- ONLINE MONITOR -------------------
-class OnlineMonitor:
-    def __init__(self, storage: Storage, feeds=None, poll_interval=30.0):
-        self.storage = storage
-        self.feeds = feeds or []
-        self.poll_interval = poll_interval
-        self._running = True
+# ------------------- CONNECTIVITY -------------------
+class Connectivity:
+    """Internet reachability probe shared by the monitors, cached for ttl seconds"""
+
+    def __init__(self, ttl=ONLINE_CHECK_TTL):
+        self.ttl = ttl
+        self.last_check = 0.0
+        self.last_result = False
+        self._lock = None
 
     @staticmethod
-    def is_online():
+    def probe():
         try:
             with closing(socket.create_connection(("8.8.8.8", 53), timeout=2)):
                 return True
         except Exception:
             return False
 
-    def fetch_feed(self, url) -> Optional[dict]:
+    async def is_online(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if time.monotonic() - self.last_check >= self.ttl:
+                # the probe blocks for up to 2 s, keep it off the event loop
+                self.last_result = await asyncio.get_running_loop().run_in_executor(None, self.probe)
+                self.last_check = time.monotonic()
+            return self.last_result
+
+
+# ------------------- ONLINE MONITOR -------------------
+def parse_feed(url, content: bytes, ctype: str, encoding=None) -> Optional[dict]:
+    # module level so it can be pickled into OnlineMonitor's worker processes
+    try:
+        if "application/json" in ctype:
+            # bytes straight into the (orjson when available) decoder, no text decode first
+            j = loads(content)
+            title = j.get("title") if isinstance(j, dict) else None
+            if not title or not isinstance(title, str):
+                title = url
+            body = dumps(j)[:1000].decode("utf-8", "ignore")
+            return {"id": url + "::" + content_hash(content[:FEED_HASH_BYTES]), "title": title, "body": body, "source": url}
+        else:
+            text = content.decode(encoding or "utf-8", "replace").strip()
+            return {"id": url + "::" + content_hash(content[:FEED_HASH_BYTES]), "title": url, "body": text[:2000], "source": url}
+    except Exception:
+        return None
+
+
+class OnlineMonitor:
+    def __init__(self, storage: Storage, connectivity: Connectivity, feeds=None, poll_interval=30.0,
+                 max_feed_bytes=FEED_MAX_BYTES):
+        self.storage = storage
+        self.connectivity = connectivity
+        self.feeds = feeds or []
+        self.poll_interval = poll_interval
+        self.max_feed_bytes = max_feed_bytes
+        self._running = True
+        self._validators = {}  # url -> conditional request headers from the last 200
+        self._session = None
+        self._parse_pool = None  # created on the first feed body over FEED_OFFLOAD_BYTES
+        if requests:
+            # keep-alive: feeds are the same hosts every poll, so reuse their connections
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=8)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+
+    def fetch_feed(self, url) -> Optional[tuple]:
+        """Download a feed; returns (body, content_type, encoding) or None if there is nothing new"""
         if not requests:
             return None
         try:
-            r = requests.get(url, timeout=6)
-            ctype = r.headers.get("content-type", "")
-            if "application/json" in ctype:
-                j = r.json()
-                title = j.get("title", url) if isinstance(j, dict) else url
-                body = json.dumps(j)[:1000]
-                return {"id": url + "::" + str(hash(r.text)), "title": title, "body": body, "source": url}
-            else:
-                text = r.text.strip()
-                return {"id": url + "::" + str(hash(text)), "title": url, "body": text[:2000], "source": url}
+            # stream so an oversized body can be refused before it is downloaded
+            r = self._session.get(url, timeout=6, headers=self._validators.get(url), stream=True)
+            if r.status_code == 304:
+                # unchanged since the last poll; read the (empty) body so the
+                # streamed response hands its connection back to the pool
+                r.content
+                return None
+            if int(r.headers.get("content-length") or 0) > self.max_feed_bytes:
+                r.close()
+                return None
+            if r.status_code == 200:
+                validators = {}
+                if r.headers.get("etag"):
+                    validators["If-None-Match"] = r.headers["etag"]
+                if r.headers.get("last-modified"):
+                    validators["If-Modified-Since"] = r.headers["last-modified"]
+                self._validators[url] = validators
+            return r.content, r.headers.get("content-type", ""), r.encoding
+        except Exception:
+            return None
+
+    async def parse(self, url, fetched) -> Optional[dict]:
+        content = fetched[0]
+        if len(content) <= FEED_OFFLOAD_BYTES:
+            return parse_feed(url, *fetched)
+        # big bodies would hold the GIL for the whole parse; use a worker process instead
+        if self._parse_pool is None:
+            self._parse_pool = concurrent.futures.ProcessPoolExecutor(max_workers=2)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._parse_pool, parse_feed, url, *fetched)
         except Exception:
             return None
 
     async def run(self):
         while self._running:
-            online = self.is_online()
+            online = await self.connectivity.is_online()
             if online and self.feeds and requests:
-                for url in self.feeds:
-                    fetched = await asyncio.get_running_loop().run_in_executor(None, lambda u=url: self.fetch_feed(u))
+                loop = asyncio.get_running_loop()
+                results = await asyncio.gather(
+                    *(loop.run_in_executor(None, self.fetch_feed, url) for url in self.feeds)
+                )
+                for url, fetched in zip(self.feeds, results):
+                    if fetched:
+                        fetched = await self.parse(url, fetched)
                     if fetched:
                         self.storage.insert_alert(fetched["id"], fetched["title"], fetched["body"], fetched["source"])
                         print(f"[online-monitor] fetched alert from {url}")
             await asyncio.sleep(self.poll_interval)
 
+    def close(self):
+        self._running = False
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+
 
 # ------------------- SIGNAL NOTIFIER -------------------
 class SignalNotifier:
-    def __init__(self, storage: Storage, check_interval=5.0):
+    def __init__(self, storage: Storage, connectivity: Connectivity, check_interval=5.0):
         self.storage = storage
+        self.connectivity = connectivity
         self.check_interval = check_interval
         self._seen_online = False
 
-    @staticmethod
-    def is_online():
-        try:
-            with closing(socket.create_connection(("8.8.8.8", 53), timeout=2)):
-                return True
-        except Exception:
-            return False
-
     async def run(self):
         while True:
-            online = self.is_online()
+            online = await self.connectivity.is_online()
             if online and not self._seen_online:
                 print("[signal-notifier] connectivity detected. Attempting to forward pending messages...")
                 pending = self.storage.get_pending_messages()
-                for row in pending:
-                    mid = row["id"]
-                    print(f"[signal-notifier] forwarding message {mid[:8]} (origin={row['origin_id']}, type={row['type']}) -> (SIMULATED)")
-                    self.storage.mark_forwarded(mid)
+                with self.storage.transaction():
+                    for row in pending:
+                        mid = row["id"]
+                        print(f"[signal-notifier] forwarding message {mid[:8]} (origin={row['origin_id']}, type={row['type']}) -> (SIMULATED)")
+                        self.storage.mark_forwarded(mid)
                 self._seen_online = True
             elif not online:
                 self._seen_online = False
@@ -326,66 +652,78 @@ class SignalNotifier:
 
 
 # ------------------- MESSAGE HANDLER -------------------
-async def on_incoming_message(msg: dict, addr, storage: Storage, udp_peer: UDPPeer):
-    t = msg.get("type", "")
-    if t == "ANNOUNCE":
+async def _handle_dm_msg(msg: dict, addr, storage: Storage, udp_peer: UDPPeer):
+    dest = msg.get("dest_id", "")
+    if dest and dest != udp_peer.node_id:
         return
 
-    if t == "DM_MSG":
-        dest = msg.get("dest_id", "")
-        if dest and dest != udp_peer.node_id:
-            return
+    mid = msg.get("id")
+    if not mid or storage.seen(mid):
+        return
 
-        mid = msg.get("id")
-        if not mid:
-            return
+    hops = int(msg.get("hops", 0))
+    ttl = int(msg.get("ttl", MESSAGE_TTL))
+
+    inserted = storage.insert_message({
+        "id": mid,
+        "origin_id": msg.get("origin_id", ""),
+        "origin_label": msg.get("origin_label", ""),
+        "dest_id": msg.get("dest_id", ""),
+        "type": msg.get("subtype", "SOS"),
+        "payload": msg.get("payload", ""),
+        "timestamp": msg.get("timestamp", now_iso()),
+        "hops": hops,
+        "ttl": ttl,
+    })
+    if inserted:
+        log.info("[recv] new msg %.8s type=%s hops=%d ttl=%d from %s", mid, msg.get("subtype"), hops, ttl, addr)
+    else:
+        return
 
-        hops = int(msg.get("hops", 0))
-        ttl = int(msg.get("ttl", MESSAGE_TTL))
-
-        inserted = storage.insert_message({
-            "id": mid,
-            "origin_id": msg.get("origin_id", ""),
-            "origin_label": msg.get("origin_label", ""),
-            "dest_id": msg.get("dest_id", ""),
-            "type": msg.get("subtype", "SOS"),
-            "payload": msg.get("payload", ""),
-            "timestamp": msg.get("timestamp", now_iso()),
-            "hops": hops,
-            "ttl": ttl,
-        })
-        if inserted:
-            print(f"[recv] new msg {mid[:8]} type={msg.get('subtype')} hops={hops} ttl={ttl} from {addr}")
-        else:
-            return
+    # send ACK
+    ack = {"type": "DM_ACK", "orig_msg_id": mid, "from_node": udp_peer.node_id, "timestamp": now_iso()}
+    udp_peer.send_packet(ack)
+    # our own ACK is dropped on receipt as a self-tagged echo, so record it here
+    storage.mark_acknowledged(mid)
+    log.info("[ack] sent ack for %.8s", mid)
+
+    # relay
+    if hops < ttl:
+        outgoing = dict(msg)
+        outgoing["hops"] = hops + 1
+        udp_peer.send_packet(outgoing)
+        log.info("[relay] relayed %.8s hop -> %d", mid, outgoing["hops"])
+
+
+async def _handle_dm_ack(msg: dict, addr, storage: Storage, udp_peer: UDPPeer):
+    orig_mid = msg.get("orig_msg_id")
+    if not orig_mid:
+        return
+    stored = storage.get_message(orig_mid)
+    if stored:
+        storage.mark_acknowledged(orig_mid)
+        log.info("[ack-recv] message %.8s acknowledged by %s", orig_mid, msg.get("from_node"))
+
+
+# packet type -> handler; ANNOUNCE and unknown types have none and are ignored
+_HANDLERS = {
+    "DM_MSG": _handle_dm_msg,
+    "DM_ACK": _handle_dm_ack,
+}
 
-        # send ACK
-        ack = {"type": "DM_ACK", "orig_msg_id": mid, "from_node": udp_peer.node_id, "timestamp": now_iso()}
-        udp_peer.send_packet(ack)
-        print(f"[ack] sent ack for {mid[:8]}")
-
-        # relay
-        if hops < ttl:
-            outgoing = dict(msg)
-            outgoing["hops"] = hops + 1
-            udp_peer.send_packet(outgoing)
-            print(f"[relay] relayed {mid[:8]} hop -> {outgoing['hops']}")
-
-    elif t == "DM_ACK":
-        orig_mid = msg.get("orig_msg_id")
-        if not orig_mid:
-            return
-        stored = storage.get_message(orig_mid)
-        if stored:
-            storage.mark_acknowledged(orig_mid)
-            print(f"[ack-recv] message {orig_mid[:8]} acknowledged by {msg.get('from_node')}")
+
+async def on_incoming_message(msg: dict, addr, storage: Storage, udp_peer: UDPPeer):
+    handler = _HANDLERS.get(msg.get("type"))
+    if handler:
+        await handler(msg, addr, storage, udp_peer)
 
 
 # ------------------- OUTGOING MESSAGE -------------------
 def build_outgoing_message(origin_id, origin_label, subtype, payload, dest_id="", ttl=MESSAGE_TTL):
     return {
         "type": "DM_MSG",
-        "id": str(uuid.uuid4()),
+        # 96 random bits as 16 url-safe chars: ample for a LAN, 20 bytes shorter than a uuid4 string
+        "id": secrets.token_urlsafe(12),
         "origin_id": origin_id,
         "origin_label": origin_label,
         "dest_id": dest_id,
@@ -401,34 +739,65 @@ def build_outgoing_message(origin_id, origin_label, subtype, payload, dest_id=""
 async def sos_resender_task(storage: Storage, udp_peer: UDPPeer):
     while True:
         rows = storage.get_unacknowledged_sos()
-        for row in rows:
-            if row["origin_id"] != udp_peer.node_id:
-                continue
-            resend_count = row["resend_count"]
-            if resend_count >= MAX_SOS_RESENDS:
-                continue
-            msg = {
-                "type": "DM_MSG",
-                "id": row["id"],
-                "origin_id": row["origin_id"],
-                "origin_label": row["origin_label"],
-                "dest_id": row["dest_id"],
-                "subtype": row["type"],
-                "payload": row["payload"],
-                "timestamp": row["timestamp"],
-                "hops": 0,
-                "ttl": row["ttl"],
-            }
-            udp_peer.send_packet(msg)
-            storage.increment_resend(row["id"])
-            print(f"[sos-resend] resent SOS {row['id'][:8]} (attempt {resend_count + 1})")
+        with storage.transaction():
+            for row in rows:
+                if row["origin_id"] != udp_peer.node_id:
+                    continue
+                resend_count = row["resend_count"]
+                if resend_count >= MAX_SOS_RESENDS:
+                    continue
+                msg = {
+                    "type": "DM_MSG",
+                    "id": row["id"],
+                    "origin_id": row["origin_id"],
+                    "origin_label": row["origin_label"],
+                    "dest_id": row["dest_id"],
+                    "subtype": row["type"],
+                    "payload": row["payload"],
+                    "timestamp": row["timestamp"],
+                    "hops": 0,
+                    "ttl": row["ttl"],
+                }
+                udp_peer.send_packet(msg)
+                storage.increment_resend(row["id"])
+                print(f"[sos-resend] resent SOS {row['id'][:8]} (attempt {resend_count + 1})")
         await asyncio.sleep(SOS_RESEND_INTERVAL)
 
 
 # ------------------- REPL -------------------
+_stdin_requests = None  # (prompt, loop, future) for the stdin thread
+
+
+def _resolve(fut, result, exc):
+    if fut.done():
+        return  # the awaiting task was cancelled meanwhile
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+
+def _stdin_worker():
+    while True:
+        prompt, loop, fut = _stdin_requests.get()
+        try:
+            result, exc = input(prompt), None
+        except (EOFError, KeyboardInterrupt) as e:
+            result, exc = None, e
+        loop.call_soon_threadsafe(_resolve, fut, result, exc)
+
+
 async def repl_input(prompt="> "):
+    # input() blocks indefinitely, so it gets its own daemon thread rather than a
+    # default-executor slot; being a daemon, it never holds up interpreter exit
+    global _stdin_requests
+    if _stdin_requests is None:
+        _stdin_requests = queue.SimpleQueue()
+        threading.Thread(target=_stdin_worker, name="repl-stdin", daemon=True).start()
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, lambda: input(prompt))
+    fut = loop.create_future()
+    _stdin_requests.put((prompt, loop, fut))
+    return await fut
 
 
 # ------------------- MAIN LOOP -------------------
@@ -437,19 +806,24 @@ async def main_loop(node_id, node_label, feeds):
     storage = Storage(db_path)
 
     udp_peer = UDPPeer(node_id, node_label, storage)
-    online_monitor = OnlineMonitor(storage, feeds=feeds)
-    signal_notifier = SignalNotifier(storage)
+    # one probe, one cached result: the monitors poll on different intervals
+    connectivity = Connectivity()
+    online_monitor = OnlineMonitor(storage, connectivity, feeds=feeds)
+    signal_notifier = SignalNotifier(storage, connectivity)
 
     async def message_cb(msg, addr):
         await on_incoming_message(msg, addr, storage, udp_peer)
 
     loop = asyncio.get_running_loop()
     tasks = [
-        loop.create_task(udp_peer.receiver(message_cb)),
+        loop.create_task(udp_peer.receiver()),
+        loop.create_task(udp_peer.consumer(message_cb)),
         loop.create_task(udp_peer.broadcaster()),
+        loop.create_task(udp_peer.sender()),
         loop.create_task(online_monitor.run()),
         loop.create_task(signal_notifier.run()),
         loop.create_task(sos_resender_task(storage, udp_peer)),
+        loop.create_task(storage.flusher()),
     ]
 
     print(f"Node {node_id} ({node_label}) started. DB: {db_path}")
@@ -489,7 +863,7 @@ async def main_loop(node_id, node_label, feeds):
                     "acknowledged": 0,
                     "resend_count": 0,
                 })
-                udp_peer.send_packet(msg)
+                udp_peer.send_packet(msg, flush=True)
                 print(f"[send] {msg['id'][:8]} subtype={subtype} to={dest_id or '<broadcast>'}")
             elif cmd.startswith("/ack "):
                 parts = cmd.split(" ", 1)
@@ -499,24 +873,27 @@ async def main_loop(node_id, node_label, feeds):
                 mid = parts[1].strip()
                 ack_msg = {"type": "DM_ACK", "orig_msg_id": mid, "from_node": node_id, "timestamp": now_iso()}
                 udp_peer.send_packet(ack_msg)
+                storage.mark_acknowledged(mid)  # the echoed ACK no longer reaches us
                 print(f"[ack] sent ack for {mid[:8]}")
             elif cmd.startswith("/list"):
+                storage.flush()  # the read connection only sees committed rows
                 if "messages" in cmd:
                     rows = storage.list_messages()
                     print("--- messages ---")
-                    for r in rows[:200]:
+                    for r in rows:
                         destpart = f" -> {r['dest_id']}" if r['dest_id'] else ""
                         print(f"{r['id'][:8]} | {r['type']}{destpart} | from={r['origin_id']} hops={r['hops']}/{r['ttl']} fwd={r['forwarded']} ack={r['acknowledged']} resends={r['resend_count']}")
                         print("   ", (r['payload'][:120] + "...") if len(r['payload'])>120 else r['payload'])
                 elif "alerts" in cmd:
                     rows = storage.list_alerts()
                     print("--- alerts ---")
-                    for r in rows[:50]:
+                    for r in rows:
                         print(f"{r['id'][:12]} | {r['title']} | {r['source']} | {r['fetched_at']}")
                         print("   ", (r['body'][:120] + "...") if len(r['body'])>120 else r['body'])
                 else:
                     print("Unknown list target")
             elif cmd == "/pending":
+                storage.flush()
                 rows = storage.get_pending_messages()
                 print("--- pending ---")
                 for r in rows:
@@ -531,7 +908,9 @@ async def main_loop(node_id, node_label, feeds):
     finally:
         for t in tasks:
             t.cancel()
+        storage.optimize()
         udp_peer.close()
+        online_monitor.close()
         await asyncio.sleep(0.2)
 
 
@@ -541,14 +920,20 @@ if __name__ == "__main__":
     parser.add_argument("--id", required=True, help="Node ID (unique per instance)")
     parser.add_argument("--label", default=None, help="Human-friendly label")
     parser.add_argument("--feed", action="append", help="Alert feed URL", default=[])
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every received/relayed packet")
     args = parser.parse_args()
 
     node_id = args.id
     label = args.label or node_id
     feeds = args.feed or DEFAULT_ALERT_FEEDS
 
+    listener = setup_logging(args.verbose)
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     try:
         asyncio.run(main_loop(node_id, label, feeds))
     except Exception as e:
         print("Fatal:", e)
         sys.exit(1)
+    finally:
+        listener.stop()
@@ -7,7 +7,7 @@ import math
 from datetime import datetime
 
 # Import DB helpers (relative import when using single-file view)
-from db import init_db, insert_alert, get_alerts, insert_guidance, get_guidance
+from db import init_db, insert_alert, get_alerts, insert_guidance, get_guidance, get_guidance_version
 
 app = Flask(__name__)
 
@@ -16,6 +16,9 @@ POLL_INTERVAL_SECONDS = 60  # poll every 60s for MVP
 MONITOR_COORD = (12.9716, 77.5946)  # Bangalore example center (lat, lon)
 MONITOR_RADIUS_KM = 500  # consider events within this radius for local alerts
 
+# Shared HTTP session so each poll reuses the keep-alive connection to the feed hosts
+_session = requests.Session()
+
 # Simple preloaded guidance (cached offline)
 PRELOADED_GUIDANCE = [
     {
@@ -55,24 +58,30 @@ def poll_usgs():
     """Poll USGS recent earthquakes (past hour) and create alerts for nearby ones."""
     try:
         url = 'https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_hour.geojson'
-        r = requests.get(url, timeout=10)
+        r = _session.get(url, timeout=10)
         r.raise_for_status()
         data = r.json()
+        # 1 degree of latitude is ~111 km, so a larger latitude gap alone rules an event out
+        max_dlat = MONITOR_RADIUS_KM / 111.0
         for feat in data.get('features', []):
             props = feat.get('properties', {})
+            mag = props.get('mag') or 0
+            # cheap checks first; the haversine trig only runs for plausible candidates
+            if mag < 3.0:
+                continue
             geom = feat.get('geometry', {})
             coords = geom.get('coordinates', [None, None])
             lon, lat = coords[0], coords[1]
-            if lat is None or lon is None:
+            if lat is None or lon is None or abs(lat - MONITOR_COORD[0]) > max_dlat:
                 continue
             dist = haversine_km(lat, lon, MONITOR_COORD[0], MONITOR_COORD[1])
-            if dist <= MONITOR_RADIUS_KM and props.get('mag', 0) >= 3.0:
+            if dist <= MONITOR_RADIUS_KM:
                 alert = {
                     'id': str(feat.get('id') or uuid.uuid4()),
                     'source': 'USGS',
                     'event_type': 'earthquake',
                     'message': f"M{props.get('mag')} earthquake {dist:.0f} km from center: {props.get('place')}",
-                    'severity': 'medium' if props.get('mag',0)<5 else 'high',
+                    'severity': 'medium' if mag<5 else 'high',
                     'latitude': lat,
                     'longitude': lon,
                     'timestamp': int((props.get('time') or int(time.time()*1000))/1000)
@@ -89,7 +98,7 @@ def poll_weather():
         lat, lon = MONITOR_COORD
         # Open-Meteo hourly forecast (no API key required)
         url = f'https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=windgusts_10m,precipitation&forecast_days=1'
-        r = requests.get(url, timeout=10)
+        r = _session.get(url, timeout=10)
         r.raise_for_status()
         data = r.json()
         hourly = data.get('hourly', {})
@@ -135,9 +144,10 @@ def poll_loop(stop_event):
     while not stop_event.is_set():
         poll_usgs()
         poll_weather()
-        # re-save guidance (acts as offline cache)
+        # re-save guidance (acts as offline cache), skipping rows that are already current
         for g in PRELOADED_GUIDANCE:
-            insert_guidance(g)
+            if get_guidance_version(g['id']) != g['last_updated']:
+                insert_guidance(g)
         stop_event.wait(POLL_INTERVAL_SECONDS)
 
 # API endpoints
@@ -1,17 +1,33 @@
 import sqlite3
 import threading
-from contextlib import closing
 from pathlib import Path
 
 DB_PATH = Path(__file__).resolve().parents[1] / 'data' / 'safeahead.db'
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
+# serializes writers only. Reads skip it because they need no coordination, not
+# because they run in parallel: SQLite's own connection mutex already serializes
+# every statement on the shared connection, and with autocommit each statement is
+# its own transaction, so a read never sees a half-applied write
 DB_LOCK = threading.Lock()
 
+def _connect():
+    # autocommit: each statement commits on its own, multi-statement writes take DB_LOCK
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=134217728')
+    conn.execute('PRAGMA cache_size=-20000')
+    return conn
+
+# one long-lived connection shared by the poller thread and the request handlers
+_CONN = _connect()
+
 def init_db():
-    with DB_LOCK, closing(sqlite3.connect(DB_PATH)) as conn:
-        c = conn.cursor()
-        c.execute('''
+    with DB_LOCK:
+        _CONN.execute('''
             CREATE TABLE IF NOT EXISTS alerts (
                 id TEXT PRIMARY KEY,
                 source TEXT,
@@ -23,7 +39,7 @@ def init_db():
                 timestamp INTEGER
             )
         ''')
-        c.execute('''
+        _CONN.execute('''
             CREATE TABLE IF NOT EXISTS guidance (
                 id TEXT PRIMARY KEY,
                 topic TEXT,
@@ -31,43 +47,34 @@ def init_db():
                 last_updated INTEGER
             )
         ''')
-        conn.commit()
 
 def insert_alert(alert):
-    with DB_LOCK, closing(sqlite3.connect(DB_PATH)) as conn:
-        c = conn.cursor()
-        c.execute('''
+    with DB_LOCK:
+        _CONN.execute('''
             INSERT OR REPLACE INTO alerts (id, source, event_type, message, severity, latitude, longitude, timestamp)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             alert['id'], alert['source'], alert['event_type'], alert['message'], alert.get('severity'),
             alert.get('latitude'), alert.get('longitude'), alert['timestamp']
         ))
-        conn.commit()
 
 def get_alerts():
-    with DB_LOCK, closing(sqlite3.connect(DB_PATH)) as conn:
-        c = conn.cursor()
-        c.execute('SELECT id, source, event_type, message, severity, latitude, longitude, timestamp FROM alerts ORDER BY timestamp DESC')
-        rows = c.fetchall()
-        cols = ['id','source','event_type','message','severity','latitude','longitude','timestamp']
-        return [dict(zip(cols,row)) for row in rows]
+    rows = _CONN.execute('SELECT id, source, event_type, message, severity, latitude, longitude, timestamp FROM alerts ORDER BY timestamp DESC').fetchall()
+    return list(map(dict, rows))
 
 def insert_guidance(guidance):
-    with DB_LOCK, closing(sqlite3.connect(DB_PATH)) as conn:
-        c = conn.cursor()
-        c.execute('''
+    with DB_LOCK:
+        _CONN.execute('''
             INSERT OR REPLACE INTO guidance (id, topic, content, last_updated)
             VALUES (?, ?, ?, ?)
         ''', (
             guidance['id'], guidance['topic'], guidance['content'], guidance['last_updated']
         ))
-        conn.commit()
+
+def get_guidance_version(guidance_id):
+    row = _CONN.execute('SELECT last_updated FROM guidance WHERE id = ?', (guidance_id,)).fetchone()
+    return row[0] if row else None
 
 def get_guidance():
-    with DB_LOCK, closing(sqlite3.connect(DB_PATH)) as conn:
-        c = conn.cursor()
-        c.execute('SELECT id, topic, content, last_updated FROM guidance')
-        rows = c.fetchall()
-        cols = ['id','topic','content','last_updated']
-        return [dict(zip(cols,row)) for row in rows]
\ No newline at end of file
+    rows = _CONN.execute('SELECT id, topic, content, last_updated FROM guidance').fetchall()
+    return list(map(dict, rows))
@@ -2,52 +2,186 @@
 It will try to reach the backend; if unavailable, it reads the last cached alerts from disk.
 """
 
-import requests
+import functools
+from collections import namedtuple
 import json
+import logging
+import mmap
+import os
 import sys
+import threading
 from pathlib import Path
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    loads = json.loads
+
+log = logging.getLogger(__name__)
+
 BACKEND_URL = 'http://127.0.0.1:5000'
 CACHE_FILE = Path.home() / '.safeahead_cache.json'
+CACHE_MMAP_BYTES = 1024 * 1024  # larger caches are parsed from a memory map, not a heap copy
+TIME_FMT = '%Y-%m-%d %H:%M:%S'
+ALERT_FMT = '- [%s] %s (severity: %s) @ %s'
+MAX_AGE = 30  # seconds a cached alert list is shown without contacting the backend
+SWR = 300  # past MAX_AGE, show the cache for this much longer while refreshing it in the background
+ALERT_TTL = 3600  # offline fallback: cached alerts older than this (by their own timestamp) are hidden
+CACHE_ROTTEN = 24 * 3600  # a cache written longer ago than this is ignored entirely
+SEVERITY_RANK = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3, 'info': 4}
+
+# parsed once from the JSON dicts; fields are then plain tuple slots
+Alert = namedtuple('Alert', 'event_type message severity timestamp')
+
+def _to_alert(a):
+    g = a.get
+    return Alert(g('event_type'), g('message'), g('severity'), g('timestamp'))
 
-def fetch_online():
+def write_cache(alerts):
+    # write then rename, so a concurrent reader never sees a half-written file;
+    # the temp name is per process so two clients refreshing at once cannot interleave
+    tmp = CACHE_FILE.with_name(f'{CACHE_FILE.name}.{os.getpid()}.tmp')
+    try:
+        tmp.write_bytes(dumps({'alerts': alerts, 'ts': int(time.time())}))
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        raise
+
+def fetch_online(quiet=False):
+    # imported here: requests is the slowest import in the module and only this path needs it
+    import requests
     try:
         r = requests.get(BACKEND_URL + '/alerts', timeout=5)
         r.raise_for_status()
         alerts = r.json().get('alerts', [])
-        # write cache
-        CACHE_FILE.write_text(json.dumps({'alerts': alerts, 'ts': int(time.time())}))
-        return alerts
+        write_cache(alerts)
+        return list(map(_to_alert, alerts))
     except Exception as e:
-        print('Failed to reach backend:', e)
+        if not quiet:
+            log.error('Failed to reach backend: %s', e)
         return None
 
-def read_cache():
-    if CACHE_FILE.exists():
-        data = json.loads(CACHE_FILE.read_text())
-        return data.get('alerts', []), data.get('ts')
-    return [], None
+# last parsed cache file, keyed by its stat signature so an unchanged file is not re-parsed
+_CACHE = {'key': None, 'val': None}
+
+def _load_cache(path, st):
+    key = (path, st.st_ino, st.st_mtime_ns, st.st_size)
+    if key == _CACHE['key']:
+        return _CACHE['val']
+    try:
+        with open(path, 'rb') as f:
+            if orjson is not None and st.st_size > CACHE_MMAP_BYTES:
+                # orjson parses straight from the mapped pages
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, memoryview(m) as view:
+                    data = loads(view)
+            else:
+                # bytes straight into the decoder, no str decode first
+                data = loads(f.read())
+    except (OSError, ValueError):
+        # unreadable or corrupt (e.g. a torn write): behave as if there were no cache,
+        # so the caller falls through to the backend and rewrites the file
+        data = None
+    if not isinstance(data, dict) or not isinstance(data.get('alerts', []), list):
+        data = None
+    _CACHE['key'], _CACHE['val'] = key, data
+    return data
+
+def read_cache(max_age_s=None):
+    # a single stat both detects the missing file and keys _load_cache;
+    # the path is taken from CACHE_FILE per call so it always matches write_cache
+    path = os.fspath(CACHE_FILE)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return [], None
+    data = _load_cache(path, st)
+    if data is None:
+        return [], None
+    ts = data.get('ts')
+    now = time.time()
+    if not isinstance(ts, (int, float)) or not ts or now - ts > CACHE_ROTTEN:
+        return [], None
+    # max_age_s=None replays the cache as the backend returned it
+    alerts = [_to_alert(a) for a in data.get('alerts', [])
+              if isinstance(a, dict) and (max_age_s is None or now - (a.get('timestamp') or 0) < max_age_s)]
+    return alerts, ts
+
+@functools.lru_cache(maxsize=4096)
+def _fmt_ts(ts):
+    # alerts from one burst often share a timestamp
+    return time.strftime(TIME_FMT, time.localtime(ts))
+
+def _format_alert(a):
+    ts = a.timestamp
+    return ALERT_FMT % (a.event_type, a.message, a.severity, _fmt_ts(int(ts)) if ts else 'unknown')
 
 def pretty_print_alert(a):
-    ts = a.get('timestamp')
-    tstr = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)) if ts else 'unknown'
-    print(f"- [{a.get('event_type')}] {a.get('message')} (severity: {a.get('severity')}) @ {tstr}")
+    print(_format_alert(a))
 
-if __name__ == '__main__':
+def _severity_order(alerts):
+    # most severe first; sort is stable, so the backend's newest-first order holds within a level
+    rank = SEVERITY_RANK.get
+    unranked = len(SEVERITY_RANK)
+    return sorted(alerts, key=lambda a: rank(a.severity, unranked))
+
+def print_alerts(alerts):
+    alerts = _severity_order(alerts)
+    # one write for the whole list instead of a print() per alert
+    out = sys.stdout
+    buf = getattr(out, 'buffer', None)
+    if buf is None:
+        # e.g. stdout replaced by a StringIO
+        out.write('\n'.join(map(_format_alert, alerts)) + '\n')
+        return
+    # go under the TextIOWrapper: encode once here, then hand raw bytes to the buffer
+    enc = out.encoding or 'utf-8'
+    data = bytearray()
+    for a in alerts:
+        data += (_format_alert(a) + '\n').encode(enc, 'replace')
+    out.flush()
+    buf.write(data)
+    buf.flush()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    alerts, ts = read_cache()
+    age = time.time() - ts if ts else None
+    if age is not None and age < MAX_AGE + SWR:
+        # stale-while-revalidate: answer from the cache, refresh it after if it is getting old
+        if age >= MAX_AGE:
+            # not a daemon, so the refresh completes before the process exits
+            threading.Thread(target=fetch_online, kwargs={'quiet': True}).start()
+        if not alerts:
+            print('No active alerts.')
+        else:
+            print(f"Active alerts (cached at {_fmt_ts(ts)}):")
+            print_alerts(alerts)
+        return
     alerts = fetch_online()
     if alerts is None:
-        alerts, ts = read_cache()
+        # the backend is unreachable: show the cache, minus alerts too old to still be current
+        alerts, ts = read_cache(max_age_s=ALERT_TTL)
         if alerts:
-            print(f"Offline mode — showing cached alerts (cached at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))})")
-            for a in alerts:
-                pretty_print_alert(a)
+            print(f"Offline mode — showing cached alerts (cached at {_fmt_ts(ts)})")
+            print_alerts(alerts)
         else:
             print('No cached alerts available.')
-        sys.exit(0)
+        return
     if not alerts:
         print('No active alerts.')
     else:
         print('Active alerts (live):')
-        for a in alerts:
-            pretty_print_alert(a)
\ No newline at end of file
+        print_alerts(alerts)
+
+if __name__ == '__main__':
+    main()